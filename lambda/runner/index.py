@@ -1,21 +1,95 @@
+import contextlib
 import json
 import os
 import shutil
+import signal
 import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 
 import boto3  # type: ignore
 import requests  # type: ignore
-
-secretsmanager = boto3.client("secretsmanager")
+from botocore.config import Config  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+from urllib3.util.retry import Retry  # type: ignore
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # Fall back to stdlib json when orjson isn't bundled (e.g. local tests)
+    orjson = None
+
+# Share one session and connection-pool config across AWS clients
+_session = boto3.session.Session()
+_client_config = Config(
+    max_pool_connections=20,
+    retries={"max_attempts": 3, "mode": "standard"},
+    tcp_keepalive=True,
+)
+secretsmanager = _session.client("secretsmanager", config=_client_config)
+
+# Cache secrets to avoid repeated Secrets Manager calls on warm invocations
+SECRET_CACHE_TTL = float(os.environ.get("SECRET_CACHE_TTL", "900"))
+_secret_cache: dict[str, tuple[str, float]] = {}
+
+# Reuse one HTTP session so warm invocations keep the TLS connection to GitHub
+_http = requests.Session()
+_http.headers.update({"Accept": "application/vnd.github.v3+json", "User-Agent": "lambda-runner"})
+_http.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=frozenset({"GET", "POST"}),
+        ),
+    ),
+)
+
+# Pre-installed runner baked into the image; RUNNER_SOURCE_DIR can point at another
+# read-only copy (e.g. an EFS access point mounted at /mnt/runner/<version>), with
+# the image copy used as a fallback when that directory isn't present
+DEFAULT_RUNNER_SOURCE_DIR = Path("/opt/actions-runner")
+RUNNER_SOURCE_DIR = Path(os.environ.get("RUNNER_SOURCE_DIR", str(DEFAULT_RUNNER_SOURCE_DIR)))
+RUNNER_CACHE_ROOT = Path("/tmp/runner-cache")
+WORK_DIR = Path("/tmp/runner-work")
+
+RUNNER_LABELS = "self-hosted,lambda-runner,linux,x64,aws-cli,sam-cli,python,python3.13"
+
+RUNNER_TIMEOUT = 840  # 14 minutes (leave 1 minute for cleanup)
+RUNNER_KILL_GRACE = 10  # Seconds to wait after SIGTERM before SIGKILL
+
+# Per-job state written into the runner directory by config.sh and run.sh
+RUNNER_STATE_ENTRIES = (".runner", ".credentials", ".credentials_rsaparams", "_diag")
+
+# The runner resolves its root from the real path of its scripts and binaries,
+# so top-level files and these directories are copied instead of symlinked
+RUNNER_COPIED_DIRS = frozenset({"bin"})
+
+# Cache the prepared runner directory to avoid re-copying it on warm invocations
+_RUNNER_READY: Path | None = None
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize to a JSON string, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
 
 
 def get_secret(secret_name: str) -> str:
-    """Get secret from AWS Secrets Manager"""
+    """Get secret from AWS Secrets Manager with caching"""
+    cached = _secret_cache.get(secret_name)
+    if cached is not None and time.monotonic() - cached[1] < SECRET_CACHE_TTL:
+        return cached[0]
+
     try:
         response = secretsmanager.get_secret_value(SecretId=secret_name)
+        _secret_cache[secret_name] = (response["SecretString"], time.monotonic())
         return response["SecretString"]
     except Exception as e:
         print(f"Error retrieving secret {secret_name}: {str(e)}")
@@ -25,44 +99,115 @@ def get_secret(secret_name: str) -> str:
 def get_registration_token(repo_full_name: str, github_token: str) -> str:
     """Get a registration token from GitHub API"""
     url = f"https://api.github.com/repos/{repo_full_name}" "/actions/runners/registration-token"
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json",
-    }
+    headers = {"Authorization": f"token {github_token}"}
 
-    response = requests.post(url, headers=headers)
+    response = _http.post(url, headers=headers)
     response.raise_for_status()
 
     return response.json()["token"]
 
 
-def setup_runner(work_dir: Path) -> Path:
-    """
-    Copy pre-installed runner to /tmp for execution
-    (Lambda's /opt directory is read-only)
-    """
-    source_dir = Path("/opt/actions-runner")
-    runner_dir = work_dir / "runner"
+def get_runner_source_dir() -> Path:
+    """Pick the configured runner installation, falling back to the one in the image"""
+    if RUNNER_SOURCE_DIR == DEFAULT_RUNNER_SOURCE_DIR or RUNNER_SOURCE_DIR.exists():
+        source_dir = RUNNER_SOURCE_DIR
+    else:
+        print(f"Runner source {RUNNER_SOURCE_DIR} not found, falling back to image copy")
+        source_dir = DEFAULT_RUNNER_SOURCE_DIR
+    print(f"Using GitHub Actions runner from {source_dir}")
+    return source_dir
 
-    if not source_dir.exists():
-        raise RuntimeError("GitHub Actions runner not found at /opt/actions-runner")
 
-    # Read and log the installed version
+def get_runner_version(source_dir: Path) -> str:
+    """Read the installed runner version from version.txt"""
     version_file = source_dir / "version.txt"
     if version_file.exists():
-        with open(version_file) as f:
-            version = f.read().strip()
-            print(f"Using pre-installed GitHub Actions runner " f"version: {version}")
-    else:
-        print("Using pre-installed GitHub Actions runner (version unknown)")
+        return version_file.read_text().strip() or "unknown"
+    return "unknown"
+
+
+def setup_runner(runner_dir: Path, source_dir: Path) -> Path:
+    """
+    Build a writable runner tree in /tmp for execution
+    (Lambda's /opt directory is read-only)
 
-    # Copy runner to /tmp (writable location)
-    print(f"Copying runner from {source_dir} to {runner_dir}")
-    shutil.copytree(source_dir, runner_dir, symlinks=True)
+    Large read-only directories (e.g. externals) are symlinked back to /opt
+    rather than copied; only what the runner writes to or resolves its
+    root from is materialized in /tmp.
+    """
+    if not source_dir.exists():
+        raise RuntimeError(f"GitHub Actions runner not found at {source_dir}")
+
+    # Discard any partial tree left behind by a previous container session
+    if runner_dir.exists():
+        shutil.rmtree(runner_dir)
+
+    print(f"Linking runner from {source_dir} into {runner_dir}")
+    os.makedirs(runner_dir)
+    with os.scandir(source_dir) as entries:
+        for entry in entries:
+            if entry.name in RUNNER_STATE_ENTRIES:
+                continue
+            dst = runner_dir / entry.name
+            if entry.is_dir(follow_symlinks=False) and entry.name not in RUNNER_COPIED_DIRS:
+                os.symlink(entry.path, dst, target_is_directory=True)
+            elif entry.is_dir(follow_symlinks=False):
+                shutil.copytree(entry.path, dst, symlinks=True)
+            else:
+                shutil.copy2(entry.path, dst, follow_symlinks=False)
 
     return runner_dir
 
 
+def reset_runner_state(runner_dir: Path) -> None:
+    """Remove registration and diagnostic state left by a previous job"""
+    for name in RUNNER_STATE_ENTRIES:
+        path = runner_dir / name
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path)
+        elif path.exists() or path.is_symlink():
+            path.unlink()
+
+
+def get_runner_dir() -> Path:
+    """Get a writable runner directory, reusing the cached copy on warm invocations"""
+    global _RUNNER_READY
+
+    if _RUNNER_READY is not None and (_RUNNER_READY / "config.sh").exists():
+        print(f"Reusing cached GitHub Actions runner at {_RUNNER_READY}")
+        reset_runner_state(_RUNNER_READY)
+        return _RUNNER_READY
+
+    source_dir = get_runner_source_dir()
+    version = get_runner_version(source_dir)
+    print(f"Using GitHub Actions runner version: {version}")
+    _RUNNER_READY = setup_runner(RUNNER_CACHE_ROOT / version, source_dir)
+
+    return _RUNNER_READY
+
+
+def run_runner(runner_dir: Path) -> int:
+    """
+    Run the runner in its own process group so the whole process tree
+    (Runner.Listener, Runner.Worker and job steps) is reaped on timeout
+    """
+    proc = subprocess.Popen(["./run.sh"], cwd=runner_dir, start_new_session=True)
+    try:
+        return proc.wait(timeout=RUNNER_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        print("Runner timed out, terminating runner process group")
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGTERM)
+        with contextlib.suppress(subprocess.TimeoutExpired):
+            proc.wait(timeout=RUNNER_KILL_GRACE)
+        raise
+    finally:
+        # Kill anything still left in the group before Lambda freezes the container
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGKILL)
+        proc.wait()
+
+
 def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     """
     Execute GitHub Actions workflow as an ephemeral runner
@@ -78,18 +223,21 @@ def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
         print(f"Processing job {job_id}: {job_name}")
         print(f"Repository: {repo_full_name}")
 
-        # Get GitHub token from Secrets Manager
+        # GitHub token lives in Secrets Manager
         github_token_secret = os.environ.get("GITHUB_TOKEN_SECRET_NAME")
         if not github_token_secret:
             raise ValueError("GITHUB_TOKEN_SECRET_NAME environment variable not set")
-        github_token = get_secret(github_token_secret)
 
-        # Create working directory for runner execution
-        work_dir = Path("/tmp/runner-work")
-        work_dir.mkdir(exist_ok=True)
+        # Create per-job working directory for runner execution
+        WORK_DIR.mkdir(exist_ok=True)
 
-        # Copy pre-installed runner to /tmp (Lambda's /opt is read-only)
-        runner_dir = setup_runner(work_dir)
+        # Fetch the GitHub token and prepare the runner in /tmp (Lambda's /opt
+        # is read-only) concurrently; both are I/O bound and independent
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            secret_future = executor.submit(get_secret, github_token_secret)
+            runner_future = executor.submit(get_runner_dir)
+            runner_dir = runner_future.result()
+            github_token = secret_future.result()
 
         # Get registration token
         print("Getting registration token from GitHub")
@@ -97,10 +245,9 @@ def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
 
         # Configure runner as ephemeral (one-time use)
         runner_name = f"lambda-runner-{job_id}-{int(time.time())}"
-        labels = "self-hosted,lambda-runner,linux,x64," "aws-cli,sam-cli,python,python3.13"
 
         print(f"Configuring runner: {runner_name}")
-        work_path = str(work_dir / "work")
+        work_path = str(WORK_DIR / "work")
         config_cmd = [
             "./config.sh",
             "--url",
@@ -110,7 +257,7 @@ def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
             "--name",
             runner_name,
             "--labels",
-            labels,
+            RUNNER_LABELS,
             "--work",
             work_path,  # Absolute path to writable /tmp
             "--ephemeral",  # Auto-remove after one job
@@ -118,49 +265,65 @@ def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
             "--unattended",
         ]
 
-        subprocess.run(config_cmd, cwd=runner_dir, check=True, capture_output=True, text=True)
-
-        print("Starting runner")
-        # Run the runner to pick up and execute the job
-        run_result = subprocess.run(
-            ["./run.sh"],
-            cwd=runner_dir,
-            capture_output=True,
-            text=True,
-            timeout=840,  # 14 minutes (leave 1 minute for cleanup)
-        )
-
-        print(f"Runner stdout:\n{run_result.stdout}")
-        if run_result.stderr:
-            print(f"Runner stderr:\n{run_result.stderr}")
-
-        if run_result.returncode != 0:
-            print(f"Runner failed with exit code {run_result.returncode}")
-            return {"statusCode": 500, "body": json.dumps({"error": "Runner execution failed"})}
+        # stdout goes straight to the log; stderr is only kept to report failures
+        try:
+            subprocess.run(config_cmd, cwd=runner_dir, check=True, stderr=subprocess.PIPE)
+        except subprocess.CalledProcessError as e:
+            print(f"Runner configuration failed:\n{e.stderr.decode('utf-8', errors='replace')}")
+            # Don't propagate e itself: its message includes the registration token
+            raise RuntimeError(
+                f"Runner configuration failed with exit code {e.returncode}"
+            ) from None
+
+        # Flush so our log lines stay ordered ahead of the runner's output
+        print("Starting runner", flush=True)
+        # Run the runner to pick up and execute the job; its output is inherited
+        # and streams straight to CloudWatch instead of being buffered in memory
+        returncode = run_runner(runner_dir)
+
+        if returncode != 0:
+            print(f"Runner failed with exit code {returncode}")
+            return {"statusCode": 500, "body": json_dumps({"error": "Runner execution failed"})}
 
         print("Job completed successfully")
 
         return {
             "statusCode": 200,
-            "body": json.dumps(
+            "body": json_dumps(
                 {"message": "Job completed", "job_id": job_id, "runner_name": runner_name}
             ),
         }
 
     except subprocess.TimeoutExpired:
         print("Runner execution timed out (approaching Lambda limit)")
-        return {"statusCode": 500, "body": json.dumps({"error": "Execution timeout"})}
+        return {"statusCode": 500, "body": json_dumps({"error": "Execution timeout"})}
     except Exception as e:
         print(f"Error executing runner: {str(e)}")
         import traceback
 
         traceback.print_exc()
-        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+        return {"statusCode": 500, "body": json_dumps({"error": str(e)})}
     finally:
-        # Cleanup working directory
+        # Cleanup per-job working directory (the cached runner is kept for warm invocations).
+        # A job leaves thousands of files behind; rm -rf removes them far faster than
+        # shutil.rmtree's per-entry Python loop
         try:
-            work_dir = Path("/tmp/runner-work")
-            if work_dir.exists():
-                shutil.rmtree(work_dir)
+            if WORK_DIR.exists():
+                result = subprocess.run(["rm", "-rf", str(WORK_DIR)], check=False)
+                if result.returncode != 0:
+                    print(f"Cleanup of {WORK_DIR} exited with code {result.returncode}")
         except Exception as e:
             print(f"Cleanup error: {str(e)}")
+
+
+def _prewarm() -> None:
+    """Build the runner tree during init so the first invocation reuses it"""
+    try:
+        get_runner_dir()
+    except Exception as e:
+        print(f"Runner pre-warm failed, retrying on first invocation: {str(e)}")
+
+
+# Only pre-warm inside Lambda so importing the module (e.g. in tests) has no side effects
+if os.environ.get("AWS_LAMBDA_FUNCTION_NAME"):
+    _prewarm()
@@ -1,3 +1,6 @@
+import base64
+import binascii
+import functools
 import hashlib
 import hmac
 import json
@@ -5,15 +8,61 @@ import os
 from typing import Any
 
 import boto3  # type: ignore
+from botocore.config import Config  # type: ignore
 
-lambda_client = boto3.client("lambda")
-secretsmanager = boto3.client("secretsmanager")
+try:
+    import orjson  # type: ignore
+except ImportError:  # Fall back to stdlib json when orjson isn't bundled (e.g. local tests)
+    orjson = None
 
-# Cache the webhook secret to avoid repeated Secrets Manager calls
-_webhook_secret_cache = None
+# Share one session and connection-pool config across AWS clients
+_session = boto3.session.Session()
+_client_config = Config(
+    max_pool_connections=20,
+    retries={"max_attempts": 3, "mode": "standard"},
+    tcp_keepalive=True,
+)
+lambda_client = _session.client("lambda", config=_client_config)
+secretsmanager = _session.client("secretsmanager", config=_client_config)
 
+SHA256_BLOCK_SIZE = 64
 
-def get_webhook_secret() -> str:
+# "sha256=" prefix followed by a 64-character hex digest
+SIGNATURE_PREFIX = "sha256="
+SIGNATURE_LENGTH = len(SIGNATURE_PREFIX) + 64
+
+# Reject bodies larger than any realistic GitHub webhook payload before doing any work
+MAX_BODY = 1 << 20  # 1 MiB
+
+# Job labels that route a workflow job to this runner (case-sensitive, like GitHub)
+_TRIGGER_LABELS = frozenset({"self-hosted", "lambda-runner"})
+
+# Cache the (UTF-8 encoded) webhook secret to avoid repeated Secrets Manager calls
+_webhook_secret_cache: bytes | None = None
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize to a JSON string, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+
+def json_dumps_bytes(obj: Any) -> bytes:
+    """Serialize to UTF-8 encoded JSON, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
+
+def json_loads(data: bytes | str) -> Any:
+    """Parse a JSON document, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def get_webhook_secret() -> bytes:
     """Get webhook secret from Secrets Manager with caching"""
     global _webhook_secret_cache
 
@@ -22,35 +71,66 @@ def get_webhook_secret() -> str:
         if secret_arn:
             try:
                 response = secretsmanager.get_secret_value(SecretId=secret_arn)
-                _webhook_secret_cache = response["SecretString"]
+                _webhook_secret_cache = response["SecretString"].encode("utf-8")
             except Exception as e:
                 print(f"Error retrieving webhook secret: {str(e)}")
-                return ""
+                return b""
         else:
             print("No webhook secret ARN configured")
-            return ""
+            return b""
 
     return _webhook_secret_cache
 
 
-def verify_signature(payload: str, signature: str, secret: str) -> bool:
+@functools.lru_cache(maxsize=4)
+def _hmac_sha256_pads(secret: bytes) -> tuple[Any, Any]:
+    """Precompute the keyed inner/outer SHA-256 states for HMAC (RFC 2104)"""
+    if len(secret) > SHA256_BLOCK_SIZE:
+        secret = hashlib.sha256(secret).digest()
+    key = secret.ljust(SHA256_BLOCK_SIZE, b"\0")
+    inner = hashlib.sha256(bytes(b ^ 0x36 for b in key))
+    outer = hashlib.sha256(bytes(b ^ 0x5C for b in key))
+    return inner, outer
+
+
+def hmac_sha256_hexdigest(secret: bytes, payload: bytes) -> str:
+    """
+    Compute HMAC-SHA256 from precomputed pad states, avoiding the per-call
+    key setup and object creation of hmac.new
+    """
+    inner_pad, outer_pad = _hmac_sha256_pads(secret)
+    inner = inner_pad.copy()
+    inner.update(payload)
+    outer = outer_pad.copy()
+    outer.update(inner.digest())
+    return outer.hexdigest()
+
+
+def verify_signature(payload: bytes | str, signature: str, secret: bytes | str) -> bool:
     """Verify GitHub webhook signature using HMAC-SHA256"""
     if not signature or not secret:
         return False
 
-    expected_signature = (
-        "sha256="
-        + hmac.new(secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).hexdigest()
-    )
+    # Reject malformed headers before hashing a potentially large body
+    if len(signature) != SIGNATURE_LENGTH or not signature.startswith(SIGNATURE_PREFIX):
+        return False
+
+    # Hash the raw body as delivered; only encode when given text
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    if isinstance(secret, str):
+        secret = secret.encode("utf-8")
+
+    expected_signature = SIGNATURE_PREFIX + hmac_sha256_hexdigest(secret, payload)
 
     return hmac.compare_digest(expected_signature, signature)
 
 
 def should_trigger_runner(workflow_job: dict[str, Any]) -> bool:
     """Check if workflow job should trigger our runner based on labels"""
-    labels = workflow_job.get("labels", [])
+    labels = workflow_job.get("labels") or ()
     print(f"Job labels: {labels}")
-    return "self-hosted" in labels or "lambda-runner" in labels
+    return not _TRIGGER_LABELS.isdisjoint(labels)
 
 
 def invoke_runner_lambda(
@@ -64,15 +144,15 @@ def invoke_runner_lambda(
         response = lambda_client.invoke(
             FunctionName=runner_function_name,
             InvocationType="Event",  # Async invocation
-            Payload=json.dumps({"workflow_job": workflow_job, "repository": repository}),
+            Payload=json_dumps_bytes({"workflow_job": workflow_job, "repository": repository}),
         )
         print(f"Runner invoked: {response}")
-        return {"statusCode": 200, "body": json.dumps({"message": "Event processed"})}
+        return {"statusCode": 200, "body": json_dumps({"message": "Event processed"})}
     except Exception as e:
         print(f"Error invoking runner: {str(e)}")
         return {
             "statusCode": 500,
-            "body": json.dumps({"error": f"Failed to invoke runner: {str(e)}"}),
+            "body": json_dumps({"error": f"Failed to invoke runner: {str(e)}"}),
         }
 
 
@@ -91,7 +171,19 @@ def process_workflow_job(payload: dict[str, Any], runner_function_name: str) ->
         return invoke_runner_lambda(runner_function_name, workflow_job, repository)
 
     print("Job does not require runner invocation")
-    return {"statusCode": 200, "body": json.dumps({"message": "Event processed"})}
+    return {"statusCode": 200, "body": json_dumps({"message": "Event processed"})}
+
+
+def process_ping(payload: dict[str, Any], runner_function_name: str) -> dict[str, Any]:
+    """Respond to GitHub's webhook ping event"""
+    return {"statusCode": 200, "body": json_dumps({"message": "pong"})}
+
+
+# Event type (x-github-event header) -> handler; other events are acknowledged and ignored
+_EVENT_HANDLERS = {
+    "ping": process_ping,
+    "workflow_job": process_workflow_job,
+}
 
 
 def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
@@ -105,30 +197,40 @@ def handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
         if not runner_function_name:
             raise ValueError("RUNNER_FUNCTION_NAME environment variable not set")
 
+        # Check the raw size before decoding so oversized bodies cost nothing
+        body = event.get("body") or ""
+        is_base64 = bool(event.get("isBase64Encoded"))
+        max_length = MAX_BODY * 4 // 3 + 4 if is_base64 else MAX_BODY
+        if len(body) > max_length:
+            print(f"Payload too large: {len(body)} characters (limit {max_length})")
+            return {"statusCode": 413, "body": json_dumps({"error": "Payload too large"})}
+
+        if is_base64:
+            try:
+                body = base64.b64decode(body, validate=True)
+            except binascii.Error:
+                print("Invalid base64 body")
+                return {"statusCode": 400, "body": json_dumps({"error": "Invalid body encoding"})}
+
         # Verify webhook signature
         webhook_secret = get_webhook_secret()
         signature = event.get("headers", {}).get("x-hub-signature-256", "")
-        body = event.get("body", "")
 
         if not verify_signature(body, signature, webhook_secret):
             print("Invalid signature - webhook authentication failed")
-            return {"statusCode": 401, "body": json.dumps({"error": "Invalid signature"})}
+            return {"statusCode": 401, "body": json_dumps({"error": "Invalid signature"})}
 
         # Parse the event
-        payload = json.loads(body)
+        payload = json_loads(body)
         event_type = event.get("headers", {}).get("x-github-event", "")
         print(f"Received event: {event_type}")
 
-        # Handle ping event
-        if event_type == "ping":
-            return {"statusCode": 200, "body": json.dumps({"message": "pong"})}
-
-        # Handle workflow_job event
-        if event_type == "workflow_job":
-            return process_workflow_job(payload, runner_function_name)
+        event_handler = _EVENT_HANDLERS.get(event_type)
+        if event_handler is not None:
+            return event_handler(payload, runner_function_name)
 
-        return {"statusCode": 200, "body": json.dumps({"message": "Event processed"})}
+        return {"statusCode": 200, "body": json_dumps({"message": "Event processed"})}
 
     except Exception as e:
         print(f"Error processing webhook: {str(e)}")
-        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
+        return {"statusCode": 500, "body": json_dumps({"error": str(e)})}
@@ -0,0 +1,262 @@
+"""
+Tests for runner Lambda function
+
+Focused on filesystem and process handling that runs on every job:
+- Runner source selection (configured directory or image fallback)
+- Runner tree setup (symlinked vs copied entries)
+- Per-job state reset and warm-invocation reuse
+- Secret caching
+- Process group cleanup on timeout
+- Registration token kept out of config failures
+"""
+
+import importlib.util
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# Load lambda/runner/index.py under its own name (the webhook tests also import "index")
+_spec = importlib.util.spec_from_file_location(
+    "runner_index", Path(__file__).parent.parent / "lambda" / "runner" / "index.py"
+)
+runner = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(runner)
+
+# The runner Lambda only runs on Linux (symlinks, process groups, bash scripts)
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="runner Lambda targets Linux")
+
+
+def _is_running(pid: int) -> bool:
+    """Check whether a process exists and isn't an unreaped zombie"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.fixture
+def source_dir(tmp_path):
+    """Create a minimal read-only runner installation"""
+    source = tmp_path / "actions-runner"
+    (source / "bin").mkdir(parents=True)
+    (source / "bin" / "Runner.Listener").write_text("listener")
+    (source / "externals" / "node20").mkdir(parents=True)
+    (source / "config.sh").write_text("#!/bin/bash\n")
+    (source / "run.sh").write_text("#!/bin/bash\n")
+    (source / "version.txt").write_text("2.999.0\n")
+    (source / ".runner").write_text("{}")
+    return source
+
+
+class TestSetupRunner:
+    """Test building the writable runner tree"""
+
+    def test_setup_runner_links_and_copies(self, source_dir, tmp_path):
+        """Test that large directories are symlinked and root-resolving entries copied"""
+        runner_dir = runner.setup_runner(tmp_path / "cache" / "2.999.0", source_dir)
+
+        assert (runner_dir / "externals").is_symlink()
+        assert (runner_dir / "externals").resolve() == (source_dir / "externals").resolve()
+        assert (runner_dir / "bin").is_dir() and not (runner_dir / "bin").is_symlink()
+        assert (runner_dir / "bin" / "Runner.Listener").read_text() == "listener"
+        assert not (runner_dir / "config.sh").is_symlink()
+        assert not (runner_dir / "run.sh").is_symlink()
+
+    def test_setup_runner_skips_state_entries(self, source_dir, tmp_path):
+        """Test that registration state in the source is not carried over"""
+        runner_dir = runner.setup_runner(tmp_path / "runner", source_dir)
+
+        assert not (runner_dir / ".runner").exists()
+
+    def test_setup_runner_replaces_partial_tree(self, source_dir, tmp_path):
+        """Test that leftovers from a previous container session are discarded"""
+        runner_dir = tmp_path / "runner"
+        runner_dir.mkdir()
+        (runner_dir / "stale").write_text("stale")
+
+        runner.setup_runner(runner_dir, source_dir)
+
+        assert not (runner_dir / "stale").exists()
+        assert (runner_dir / "config.sh").exists()
+
+    def test_setup_runner_missing_source(self, tmp_path):
+        """Test that a missing runner installation raises"""
+        with pytest.raises(RuntimeError):
+            runner.setup_runner(tmp_path / "runner", tmp_path / "missing")
+
+
+class TestRunnerSourceDir:
+    """Test choosing between the configured runner source and the image copy"""
+
+    def test_existing_source_dir_used(self, source_dir, monkeypatch):
+        """Test that an existing RUNNER_SOURCE_DIR is used as is"""
+        monkeypatch.setattr(runner, "RUNNER_SOURCE_DIR", source_dir)
+
+        assert runner.get_runner_source_dir() == source_dir
+
+    def test_missing_source_dir_falls_back(self, tmp_path, monkeypatch):
+        """Test that a missing RUNNER_SOURCE_DIR (e.g. unmounted EFS) falls back to /opt"""
+        monkeypatch.setattr(runner, "RUNNER_SOURCE_DIR", tmp_path / "efs" / "missing")
+
+        assert runner.get_runner_source_dir() == runner.DEFAULT_RUNNER_SOURCE_DIR
+
+
+class TestResetRunnerState:
+    """Test clearing per-job state before reusing a cached runner"""
+
+    def test_reset_runner_state(self, source_dir, tmp_path):
+        """Test that registration and diagnostic state is removed"""
+        runner_dir = runner.setup_runner(tmp_path / "runner", source_dir)
+        (runner_dir / ".runner").write_text("{}")
+        (runner_dir / ".credentials").write_text("{}")
+        (runner_dir / "_diag").mkdir()
+        (runner_dir / "_diag" / "Runner.log").write_text("log")
+
+        runner.reset_runner_state(runner_dir)
+
+        assert not (runner_dir / ".runner").exists()
+        assert not (runner_dir / ".credentials").exists()
+        assert not (runner_dir / "_diag").exists()
+        assert (runner_dir / "config.sh").exists()
+        assert (runner_dir / "externals").is_symlink()
+        assert (source_dir / "externals" / "node20").is_dir()
+
+    def test_reset_runner_state_clean_tree(self, source_dir, tmp_path):
+        """Test that resetting a tree without state is a no-op"""
+        runner_dir = runner.setup_runner(tmp_path / "runner", source_dir)
+
+        runner.reset_runner_state(runner_dir)
+
+        assert (runner_dir / "config.sh").exists()
+
+
+class TestGetRunnerDir:
+    """Test reuse of the cached runner tree across warm invocations"""
+
+    @pytest.fixture
+    def setup_calls(self, source_dir, tmp_path, monkeypatch):
+        """Point the runner cache at tmp_path and record setup_runner calls"""
+        calls = []
+        setup_runner = runner.setup_runner
+
+        def counting_setup_runner(runner_dir, source):
+            calls.append(runner_dir)
+            return setup_runner(runner_dir, source)
+
+        monkeypatch.setattr(runner, "RUNNER_SOURCE_DIR", source_dir)
+        monkeypatch.setattr(runner, "RUNNER_CACHE_ROOT", tmp_path / "cache")
+        monkeypatch.setattr(runner, "_RUNNER_READY", None)
+        monkeypatch.setattr(runner, "setup_runner", counting_setup_runner)
+        return calls
+
+    def test_get_runner_dir_reuses_cached_tree(self, setup_calls, tmp_path):
+        """Test that a warm call reuses the tree and clears the previous job's state"""
+        runner_dir = runner.get_runner_dir()
+        (runner_dir / ".runner").write_text("{}")
+
+        assert runner.get_runner_dir() == runner_dir
+        assert runner_dir == tmp_path / "cache" / "2.999.0"
+        assert setup_calls == [runner_dir]
+        assert not (runner_dir / ".runner").exists()
+
+    def test_get_runner_dir_rebuilds_missing_tree(self, setup_calls):
+        """Test that the tree is rebuilt when the cached copy is gone"""
+        runner_dir = runner.get_runner_dir()
+        (runner_dir / "config.sh").unlink()
+
+        assert runner.get_runner_dir() == runner_dir
+        assert len(setup_calls) == 2
+        assert (runner_dir / "config.sh").exists()
+
+
+class TestSecretCache:
+    """Test warm-container caching of Secrets Manager values"""
+
+    class FakeSecretsManager:
+        def __init__(self):
+            self.calls = 0
+
+        def get_secret_value(self, SecretId):
+            self.calls += 1
+            return {"SecretString": f"token-{self.calls}"}
+
+    def test_get_secret_cached(self, monkeypatch):
+        """Test that repeated lookups within the TTL hit the cache"""
+        fake = self.FakeSecretsManager()
+        monkeypatch.setattr(runner, "secretsmanager", fake)
+        monkeypatch.setattr(runner, "_secret_cache", {})
+
+        assert runner.get_secret("github-token") == "token-1"
+        assert runner.get_secret("github-token") == "token-1"
+        assert fake.calls == 1
+
+    def test_get_secret_expired(self, monkeypatch):
+        """Test that expired entries are fetched again"""
+        fake = self.FakeSecretsManager()
+        monkeypatch.setattr(runner, "secretsmanager", fake)
+        monkeypatch.setattr(runner, "_secret_cache", {})
+        monkeypatch.setattr(runner, "SECRET_CACHE_TTL", 0)
+
+        assert runner.get_secret("github-token") == "token-1"
+        assert runner.get_secret("github-token") == "token-2"
+
+
+class TestRunRunner:
+    """Test runner process handling"""
+
+    def test_run_runner_kills_process_group_on_timeout(self, tmp_path, monkeypatch):
+        """Test that background children of run.sh don't outlive a timeout"""
+        run_script = tmp_path / "run.sh"
+        run_script.write_text("#!/bin/bash\nsleep 60 &\necho $! > child.pid\nsleep 60\n")
+        run_script.chmod(0o755)
+        monkeypatch.setattr(runner, "RUNNER_TIMEOUT", 1)
+        monkeypatch.setattr(runner, "RUNNER_KILL_GRACE", 1)
+
+        with pytest.raises(subprocess.TimeoutExpired):
+            runner.run_runner(tmp_path)
+
+        child_pid = int((tmp_path / "child.pid").read_text())
+        time.sleep(0.2)
+        assert not _is_running(child_pid)
+
+    def test_run_runner_returns_exit_code(self, tmp_path):
+        """Test that the runner's exit code is returned"""
+        run_script = tmp_path / "run.sh"
+        run_script.write_text("#!/bin/bash\nexit 3\n")
+        run_script.chmod(0o755)
+
+        assert runner.run_runner(tmp_path) == 3
+
+
+class TestConfigFailure:
+    """Test that a failed runner configuration doesn't leak the registration token"""
+
+    def test_config_failure_hides_registration_token(self, tmp_path, monkeypatch, capfd):
+        """Test that the 500 body and logged traceback omit the registration token"""
+        runner_dir = tmp_path / "runner"
+        runner_dir.mkdir()
+        config_script = runner_dir / "config.sh"
+        config_script.write_text("#!/bin/bash\necho 'registration failed' >&2\nexit 1\n")
+        config_script.chmod(0o755)
+        reg_token = "AREGISTRATIONTOKEN123"
+
+        monkeypatch.setenv("GITHUB_TOKEN_SECRET_NAME", "github-token")
+        monkeypatch.setattr(runner, "WORK_DIR", tmp_path / "work")
+        monkeypatch.setattr(runner, "get_secret", lambda name: "ghp_token")
+        monkeypatch.setattr(runner, "get_runner_dir", lambda: runner_dir)
+        monkeypatch.setattr(runner, "get_registration_token", lambda repo, token: reg_token)
+
+        event = {"workflow_job": {"id": 1, "name": "build"}, "repository": {"full_name": "o/r"}}
+        response = runner.handler(event, None)
+        output = capfd.readouterr()
+
+        assert response["statusCode"] == 500
+        assert "exit code 1" in response["body"]
+        assert reg_token not in response["body"]
+        assert "registration failed" in output.out
+        assert reg_token not in output.out
+        assert reg_token not in output.err
@@ -3,18 +3,24 @@ Tests for webhook Lambda function
 
 Focused on security-critical and routing logic:
 - Signature verification (security)
-- Label matching (routing)
+- Label matching and event dispatch (routing)
+- Payload size limit and body encoding (security)
 """
 
+import base64
 import hashlib
 import hmac
+import json
 import sys
 from pathlib import Path
 
+import pytest
+
 # Add lambda/webhook to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent / "lambda" / "webhook"))
 
-from index import should_trigger_runner, verify_signature  # noqa: E402
+import index  # noqa: E402
+from index import MAX_BODY, handler, should_trigger_runner, verify_signature  # noqa: E402
 
 
 class TestSignatureVerification:
@@ -89,6 +95,151 @@ class TestSignatureVerification:
         # Verify with tampered payload should fail
         assert verify_signature(tampered_payload, signature, secret) is False
 
+    def test_verify_signature_malformed_header(self):
+        """Test that signatures with the wrong prefix or length are rejected"""
+        secret = "my-webhook-secret"
+        payload = '{"action":"queued","workflow_job":{}}'
+        digest = hmac.new(secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256)
+
+        assert verify_signature(payload, "sha1=" + digest.hexdigest(), secret) is False
+        assert verify_signature(payload, "sha256=" + digest.hexdigest()[:-1], secret) is False
+        assert verify_signature(payload, digest.hexdigest(), secret) is False
+
+    def test_verify_signature_long_secret(self):
+        """Test that secrets longer than the SHA-256 block size are handled per RFC 2104"""
+        secret = "s" * 100
+        payload = '{"action":"queued","workflow_job":{}}'
+
+        signature = (
+            "sha256="
+            + hmac.new(secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+        )
+
+        assert verify_signature(payload, signature, secret) is True
+
+    def test_verify_signature_bytes_payload_and_secret(self):
+        """Test that raw bytes payloads and pre-encoded secrets are accepted"""
+        secret = b"my-webhook-secret"
+        payload = b'{"action":"queued","workflow_job":{}}'
+
+        signature = "sha256=" + hmac.new(secret, payload, hashlib.sha256).hexdigest()
+
+        assert verify_signature(payload, signature, secret) is True
+        assert verify_signature(payload.decode("utf-8"), signature, secret) is True
+
+
+class TestPayloadSizeLimit:
+    """Test that oversized webhook bodies are rejected before any processing"""
+
+    def test_oversized_body_rejected(self, monkeypatch):
+        """Test that bodies above MAX_BODY return 413 without signature checks"""
+        monkeypatch.setenv("RUNNER_FUNCTION_NAME", "runner")
+        event = {
+            "headers": {"x-hub-signature-256": "sha256=" + "0" * 64},
+            "body": "x" * (MAX_BODY + 1),
+        }
+
+        assert handler(event, None)["statusCode"] == 413
+
+    def test_oversized_base64_body_rejected(self, monkeypatch):
+        """Test that base64 bodies decoding to more than MAX_BODY return 413"""
+        monkeypatch.setenv("RUNNER_FUNCTION_NAME", "runner")
+        event = {
+            "headers": {"x-hub-signature-256": "sha256=" + "0" * 64},
+            "body": base64.b64encode(b"x" * (MAX_BODY + 3)).decode("ascii"),
+            "isBase64Encoded": True,
+        }
+
+        assert handler(event, None)["statusCode"] == 413
+
+
+class TestBodyEncoding:
+    """Test that malformed base64 bodies are rejected before any processing"""
+
+    def test_invalid_base64_body_rejected(self, monkeypatch):
+        """Test that undecodable base64 bodies return 400 with a fixed message"""
+        monkeypatch.setenv("RUNNER_FUNCTION_NAME", "runner")
+        event = {
+            "headers": {"x-hub-signature-256": "sha256=" + "0" * 64},
+            "body": "abc",
+            "isBase64Encoded": True,
+        }
+
+        response = handler(event, None)
+
+        assert response["statusCode"] == 400
+        assert json.loads(response["body"]) == {"error": "Invalid body encoding"}
+
+
+class TestEventRouting:
+    """Test that signed events are dispatched by x-github-event type"""
+
+    SECRET = b"my-webhook-secret"
+
+    class FakeLambdaClient:
+        def __init__(self):
+            self.invocations = []
+
+        def invoke(self, **kwargs):
+            self.invocations.append(kwargs)
+            return {"StatusCode": 202}
+
+    @pytest.fixture
+    def lambda_client(self, monkeypatch):
+        """Stub the runner invocation and cache a known webhook secret"""
+        fake = self.FakeLambdaClient()
+        monkeypatch.setenv("RUNNER_FUNCTION_NAME", "runner")
+        monkeypatch.setattr(index, "lambda_client", fake)
+        monkeypatch.setattr(index, "_webhook_secret_cache", self.SECRET)
+        return fake
+
+    def signed_event(self, event_type, payload):
+        """Build an API Gateway event with a valid signature"""
+        body = json.dumps(payload)
+        signature = (
+            "sha256=" + hmac.new(self.SECRET, body.encode("utf-8"), hashlib.sha256).hexdigest()
+        )
+        return {
+            "headers": {"x-hub-signature-256": signature, "x-github-event": event_type},
+            "body": body,
+        }
+
+    def test_ping_returns_pong(self, lambda_client):
+        """Test that ping events are answered with pong"""
+        response = handler(self.signed_event("ping", {"zen": "Keep it simple."}), None)
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"message": "pong"}
+        assert lambda_client.invocations == []
+
+    def test_workflow_job_invokes_runner(self, lambda_client):
+        """Test that queued workflow_job events reach the runner Lambda"""
+        payload = {
+            "action": "queued",
+            "workflow_job": {"id": 42, "labels": ["self-hosted"]},
+            "repository": {"full_name": "owner/repo"},
+        }
+
+        response = handler(self.signed_event("workflow_job", payload), None)
+
+        assert response["statusCode"] == 200
+        assert len(lambda_client.invocations) == 1
+        invocation = lambda_client.invocations[0]
+        assert invocation["FunctionName"] == "runner"
+        assert invocation["InvocationType"] == "Event"
+        assert json.loads(invocation["Payload"]) == {
+            "workflow_job": payload["workflow_job"],
+            "repository": payload["repository"],
+        }
+
+    def test_unknown_event_acknowledged(self, lambda_client):
+        """Test that unhandled event types return 200 without invoking the runner"""
+        response = handler(self.signed_event("push", {"ref": "refs/heads/main"}), None)
+
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == {"message": "Event processed"}
+        assert lambda_client.invocations == []
+
 
 class TestLabelMatching:
     """Test workflow job label matching logic"""